@@ -0,0 +1,99 @@
+"""
+Бенчмарк extract_config_urls на больших синтетических README.
+
+Сравнивает однопроходный extract_config_urls с прежней схемой
+(три re.findall по CONFIG_URL_PATTERNS + два фильтра подстроками).
+
+    python bench_config_urls.py
+    python bench_config_urls.py --size-mb 8 --repeat 3
+"""
+import re
+import time
+import random
+import argparse
+
+from scout import extract_config_urls
+
+LEGACY_PATTERNS = [
+    r"https://raw\.githubusercontent\.com[^\s\"']+",
+    r"https://github\.com[^\s\"']+/raw[^\s\"']*",
+    r"https?://[^\s\"']*(?:sub|subscription|clash\.ya?ml|config|proxy)[^\s\"']*",
+]
+
+def legacy_extract(text):
+    urls = set()
+    for pattern in LEGACY_PATTERNS:
+        for m in re.findall(pattern, text):
+            urls.add(m.strip())
+
+    result = []
+    for u in urls:
+        low = u.lower()
+        if not any(p in low for p in ["vless", "vmess", "hysteria", "trojan", "shadow", "sub", "clash"]):
+            continue
+        if not any(p in low for p in ["vless", "reality", "vmess", "xray", "v2ray", "clash", "sub", "subscription"]):
+            continue
+        if any(b in low for b in ["iran", "/ir-", "iran-"]):
+            continue
+        if re.search(r'Sub\d+\.txt$', u):
+            continue
+        result.append(u)
+    return result
+
+def synthetic_readme(size_bytes, seed=0):
+    """README агрегатора: таблицы, длинные строки со ссылками подряд, шум"""
+    rnd = random.Random(seed)
+    hosts = ["raw.githubusercontent.com/user/repo/main", "github.com/user/repo/raw/main",
+             "example.com", "cdn.example.org/x"]
+    names = ["vless.txt", "sub", "subscription/v2ray", "clash.yaml", "config.json",
+             "proxy/list", "vmess_iran.txt", "Sub12.txt", "reality", "hysteria2.txt", "index.html"]
+    plain = ["stars", "license-mit", "build-passing", "downloads", "telegram"]
+    parts = []
+    size = 0
+    while size < size_bytes:
+        kind = rnd.random()
+        if kind < 0.2:
+            # Длинная строка из ссылок без пробелов
+            line = "".join(
+                f"https://{rnd.choice(hosts)}/{rnd.randrange(10**6)}/{rnd.choice(names)}"
+                for _ in range(rnd.randint(20, 200))
+            )
+        elif kind < 0.4:
+            # То же без ключевых слов (бейджи, картинки) — худший случай для старого
+            # паттерна: backtracking от каждого https:// до конца строки
+            line = "".join(
+                f"https://img.shields.io/badge/{rnd.randrange(10**6)}-{rnd.choice(plain)}.png"
+                for _ in range(rnd.randint(20, 200))
+            )
+        elif kind < 0.7:
+            line = f"| {rnd.randrange(1000)} | [link](https://{rnd.choice(hosts)}/{rnd.choice(names)}) |"
+        else:
+            line = "vless://" + "a" * rnd.randint(50, 400) + "@1.2.3.4:443?security=reality#node"
+        parts.append(line)
+        size += len(line) + 1
+    return "\n".join(parts)
+
+def timed(fn, text, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--size-mb", type=float, nargs="+", default=[0.25, 1, 4])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'size':>8} | {'legacy, s':>10} | {'single-pass, s':>14} | {'speedup':>7} | urls (legacy/new)")
+    for mb in args.size_mb:
+        text = synthetic_readme(int(mb * 1024 * 1024))
+        t_old, old = timed(legacy_extract, text, args.repeat)
+        t_new, new = timed(extract_config_urls, text, args.repeat)
+        print(f"{mb:>6}MB | {t_old:>10.3f} | {t_new:>14.3f} | {t_old / t_new:>6.1f}x | {len(old)}/{len(new)}")
+
+if __name__ == "__main__":
+    main()
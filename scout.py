@@ -1,17 +1,14 @@
 import os
 import json
 import asyncio
-import requests
+import argparse
 import html
 import re
+import math
+import codecs
+import heapq
 import logging
 from datetime import datetime, timedelta, timezone
-from aiogram import Bot
-from aiogram.client.default import DefaultBotProperties
-from aiogram.enums import ParseMode
-from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError
-from groq import Groq
-import aiohttp
 
 # ============ LOGGING ============
 
@@ -42,13 +39,161 @@ MESSAGE_DELAY = 3
 MIN_STARS = 0
 MIN_API_CALLS_REMAINING = 50
 
+DESC_BATCH_SIZE = 20
+DEFAULT_DESC = "Инструмент для обхода блокировок"
+
+# Диапазон коммитов через compare API
+COMMIT_RANGE_PAGE_SIZE = 100
+COMMIT_RANGE_MAX_PAGES = 3
+COMMIT_RANGE_MAX_LINES = 10
+
+# Лимиты чтения README: для проверки релевантности и для поиска ссылок на конфиги
+README_CHUNK_SIZE = 16 * 1024
+README_SCAN_MAX_BYTES = 256 * 1024
+README_MAX_BYTES = 2 * 1024 * 1024
+
+# История звёзд для трендового скоринга
+STAR_HISTORY_MAX_POINTS = 8
+STAR_HISTORY_MAX_AGE_DAYS = 30
+STAR_SNAPSHOT_MIN_INTERVAL = 3600
+
 API_HEADERS = {
     "Authorization": f"Bearer {GITHUB_TOKEN}",
     "Accept": "application/vnd.github.v3+json"
 }
 
-bot = Bot(token=TELEGRAM_BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-groq_client = Groq(api_key=GROQ_API_KEY)
+# Режим без отправки: посты только рендерятся в лог, состояние не сохраняется
+DRY_RUN = False
+
+# Шард (index, total), index с 1; None — обычный запуск
+SHARD = None
+DELTA_FILE_TEMPLATE = "scout_delta_{index}of{total}.json"
+
+STAGES = ["releases", "commits", "aggregators", "owners", "search", "configs"]
+
+# Веса для общего отбора постов (select_candidates)
+STAGE_WEIGHTS = {"releases": 3.0, "owners": 2.5, "search": 2.0, "commits": 1.0, "aggregators": 0.8}
+PROJECT_PRIORITY_WEIGHTS = {"high": 1.0, "medium": 0.6, "low": 0.2}
+
+# ============ LAZY CLIENTS ============
+# aiogram/groq/requests/aiohttp импортируются только при первом использовании,
+# чтобы запуск отдельных стадий и тестов не платил за тяжёлые импорты.
+
+_bot = None
+_groq_client = None
+_http_session = None
+
+def get_bot():
+    global _bot
+    if _bot is None:
+        from aiogram import Bot
+        from aiogram.client.default import DefaultBotProperties
+        from aiogram.enums import ParseMode
+        _bot = Bot(token=TELEGRAM_BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
+    return _bot
+
+def get_groq():
+    global _groq_client
+    if _groq_client is None:
+        from groq import Groq
+        _groq_client = Groq(api_key=GROQ_API_KEY)
+    return _groq_client
+
+def get_http():
+    """requests.Session с заголовками GitHub API"""
+    global _http_session
+    if _http_session is None:
+        import requests
+        _http_session = requests.Session()
+        _http_session.headers.update(API_HEADERS)
+    return _http_session
+
+# ============ REQUEST COALESCING ============
+# В пределах запуска одинаковые GET к GitHub выполняются один раз:
+# завершённые ответы запоминаются по URL, а одновременные async-запросы
+# с тем же URL ждут один общий future (single-flight).
+# GraphQL-обогащение запоминается отдельно, по full_name (см. enrich_repos).
+
+MEMO_STATUSES = {200, 404}
+REQUEST_STATS = {"sent": 0, "memo": 0, "coalesced": 0, "not_modified": 0}
+_memo = {}
+_memo_async = {}
+_inflight = {}
+
+def github_get(url, timeout=10, cache=True):
+    if cache and url in _memo:
+        REQUEST_STATS["memo"] += 1
+        return _memo[url]
+    REQUEST_STATS["sent"] += 1
+    resp = get_http().get(url, timeout=timeout)
+    if cache and resp.status_code in MEMO_STATUSES:
+        _memo[url] = resp
+    return resp
+
+async def github_get_raw_async(session, url, etag=None):
+    """
+    (status, body, etag) для url; status 0 — сетевая ошибка.
+    В memo и single-flight лежат сырые байты: разбор у каждого вызывающего свой.
+    """
+    import aiohttp
+    if url in _memo_async:
+        REQUEST_STATS["memo"] += 1
+        return _memo_async[url]
+    if url in _inflight:
+        REQUEST_STATS["coalesced"] += 1
+        return await asyncio.shield(_inflight[url])
+
+    fut = asyncio.get_running_loop().create_future()
+    _inflight[url] = fut
+    result = (0, None, None)
+    headers = {"If-None-Match": etag} if etag else {}
+    try:
+        REQUEST_STATS["sent"] += 1
+        async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=15)) as resp:
+            body = await resp.read() if resp.status == 200 else None
+            result = (resp.status, body, resp.headers.get("ETag"))
+        if result[0] == 304:
+            REQUEST_STATS["not_modified"] += 1
+        if result[0] in MEMO_STATUSES:
+            _memo_async[url] = result
+    except Exception as e:
+        logger.debug(f"Error requesting {url}: {e}")
+    finally:
+        _inflight.pop(url, None)
+        fut.set_result(result)
+    return result
+
+async def github_get_json_async(session, url, etag=None, loads=json.loads):
+    """
+    (status, json, etag) для url; status 0 — сетевая ошибка.
+    etag уходит в If-None-Match: ответ 304 не тратит лимит, json тогда None.
+    loads — разбор тела ответа (например, parse_repos_json).
+    """
+    status, body, new_etag = await github_get_raw_async(session, url, etag)
+    if body is None:
+        return status, None, new_etag
+    try:
+        return status, loads(body), new_etag
+    except Exception as e:
+        logger.debug(f"Error parsing {url}: {e}")
+        return 0, None, None
+
+def log_request_stats():
+    avoided = REQUEST_STATS["memo"] + REQUEST_STATS["coalesced"]
+    logger.info(
+        f"🧮 GitHub requests: {REQUEST_STATS['sent']} sent, {avoided} avoided "
+        f"({REQUEST_STATS['memo']} memoized, {REQUEST_STATS['coalesced']} coalesced), "
+        f"{REQUEST_STATS['not_modified']} not modified"
+    )
+
+async def close_clients():
+    global _bot, _http_session
+    if _bot is not None:
+        await _bot.session.close()
+        _bot = None
+    if _http_session is not None:
+        _http_session.close()
+        _http_session = None
 
 # ============ КЛЮЧЕВЫЕ ПРОЕКТЫ (коммиты + релизы) ============
 
@@ -104,6 +249,23 @@ CONFIG_AGGREGATORS = [
     {"owner": "aiboboxx", "repo": "v2rayfree", "name": "📡 V2RayFree"},
 ]
 
+# ============ ДОВЕРЕННЫЕ АВТОРЫ ============
+# Новые репозитории этих пользователей/организаций идут в кандидаты напрямую,
+# без поискового бюджета и без AI-фильтра
+
+WATCHED_OWNERS = [
+    "bol-van", "hufrea", "ValdikSS", "xvzc",
+    "XTLS", "SagerNet", "apernet", "2dust", "MatsuriDayo", "metacubex",
+    "amnezia-vpn", "MHSanaei", "hiddify", "Gozargah",
+    "AntiZapret", "roskomsvoboda",
+]
+
+WATCHED_OWNER_NAMES = {o.lower() for o in WATCHED_OWNERS}
+TRACKED_REPO_NAMES = {f"{p['owner']}/{p['repo']}".lower() for p in TRACKED_PROJECTS}
+
+OWNER_PAGE_SIZE = 30
+OWNER_MAX_PAGES = 3
+
 # ============ ПОИСКОВЫЕ ЗАПРОСЫ ============
 
 FRESH_SEARCHES = [
@@ -147,10 +309,35 @@ CONFIG_SEARCH_QUERIES = [
     "vpn configs russia vless",
 ]
 
-CONFIG_URL_PATTERNS = [
-    r"https://raw\.githubusercontent\.com[^\s\"']+",
-    r"https://github\.com[^\s\"']+/raw[^\s\"']*",
-    r"https?://[^\s\"']*(?:sub|subscription|clash\.ya?ml|config|proxy)[^\s\"']*",
+# Один проход по тексту: находим URL-спаны, затем классифицируем каждый
+# одним сканом ключевых слов (без backtracking на длинных строках)
+# Спан заканчивается на пробеле/кавычке или перед следующим http(s):// (склеенные ссылки)
+CONFIG_URL_SPAN_RE = re.compile(r"https?://(?:(?!https?://)[^\s\"'<>`])+")
+CONFIG_URL_KEYWORD_RE = re.compile(
+    r"vless|vmess|hysteria|trojan|shadow|reality|xray|v2ray"
+    r"|clash\.ya?ml|clash|sub|config|proxy|iran|/ir-"
+)
+CONFIG_URL_TRAILING = ").,;:!?]*"
+CONFIG_URL_EXCLUDE_RE = re.compile(r"Sub\d+\.txt$")
+
+# Протоколы/форматы, без которых ссылка не интересна
+CONFIG_URL_PROTOCOL_HINTS = {"vless", "vmess", "hysteria", "trojan", "shadow", "sub", "clash", "clash.yml", "clash.yaml"}
+# Ссылка должна указывать на vless/xray-совместимые конфиги
+CONFIG_URL_TARGET_HINTS = {"vless", "reality", "vmess", "xray", "v2ray", "clash", "clash.yml", "clash.yaml", "sub"}
+CONFIG_URL_BAD_HINTS = {"iran", "/ir-"}
+
+# ============ КАНАЛЫ ДОСТАВКИ ============
+# Каждый пост рендерится один раз и уходит во все подходящие каналы.
+# Значение переменной окружения: chat_id или chat_id/topic_id (тема форума).
+# Фильтры (все необязательные): stages — типы постов, priorities — priority
+# проекта, searches — имена из FRESH_SEARCHES. Канал без переменной пропускается.
+
+DESTINATIONS = [
+    {"name": "all", "env": "CHANNEL_ID"},
+    {"name": "releases", "env": "RELEASES_CHANNEL_ID", "stages": ["releases"]},
+    {"name": "configs", "env": "CONFIGS_CHANNEL_ID", "stages": ["aggregators", "search"],
+     "searches": ["RU VPN Configs", "VLESS Reality", "XRay Config", "Proxy Configs",
+                  "Sing-Box RU", "Clash Rules", "Shadowsocks", "WireGuard RU", "Outline"]},
 ]
 
 # ============ VALIDATION ============
@@ -158,10 +345,12 @@ CONFIG_URL_PATTERNS = [
 def validate_env():
     required = {
         "GROQ_API_KEY": GROQ_API_KEY,
-        "TELEGRAM_BOT_TOKEN": TELEGRAM_BOT_TOKEN,
-        "CHANNEL_ID": TARGET_CHANNEL_ID,
         "GITHUB_TOKEN": GITHUB_TOKEN
     }
+    # В dry-run Telegram не нужен
+    if not DRY_RUN and not SHARD:
+        required["TELEGRAM_BOT_TOKEN"] = TELEGRAM_BOT_TOKEN
+        required["CHANNEL_ID"] = TARGET_CHANNEL_ID
 
     missing = [k for k, v in required.items() if not v]
 
@@ -174,7 +363,7 @@ def validate_env():
 
 def check_rate_limit():
     try:
-        resp = requests.get("https://api.github.com/rate_limit", headers=API_HEADERS, timeout=10)
+        resp = github_get("https://api.github.com/rate_limit", timeout=10, cache=False)
         if resp.status_code == 200:
             data = resp.json()
             remaining = data['rate']['remaining']
@@ -203,14 +392,20 @@ def has_non_latin(text):
     ]
     return any(re.search(p, text) for p in patterns)
 
-def get_age_hours(date_string):
+def to_epoch(date_string):
     try:
         if not date_string:
-            return 9999
-        dt = datetime.fromisoformat(date_string.replace('Z', '+00:00'))
-        return (datetime.now(timezone.utc) - dt).total_seconds() / 3600
+            return None
+        return datetime.fromisoformat(date_string.replace('Z', '+00:00')).timestamp()
     except:
+        return None
+
+def get_age_hours(date_string):
+    """date_string — ISO-дата GitHub или уже разобранный epoch (RepoRecord)"""
+    ts = date_string if isinstance(date_string, (int, float)) else to_epoch(date_string)
+    if ts is None:
         return 9999
+    return (datetime.now(timezone.utc).timestamp() - ts) / 3600
 
 def get_freshness(date_string):
     hours = get_age_hours(date_string)
@@ -221,8 +416,8 @@ def get_freshness(date_string):
     elif hours < 72: return "📅 2 дня назад"
     else: return f"📅 {int(hours/24)}д назад"
 
-def is_fresh(date_string):
-    return get_age_hours(date_string) <= (MAX_AGE_DAYS * 24)
+def is_fresh(date_string, max_age_hours=None):
+    return get_age_hours(date_string) <= (max_age_hours or MAX_AGE_DAYS * 24)
 
 def safe_desc(desc, max_len=120):
     if desc is None:
@@ -231,12 +426,13 @@ def safe_desc(desc, max_len=120):
     desc = re.sub(r'[🔥⚡️✨🎉]{3,}', '', desc)
     return desc[:max_len] if desc else ""
 
-def quick_filter(name, desc, stars=0):
+def quick_filter(name, desc, stars=0, topics=None):
     """
     Улучшенная фильтрация, чтобы не ловить мусор типа
     russian-vocabulary-trainer, steel-market и т.п.
+    Топики репозитория (если есть) учитываются наравне с описанием.
     """
-    text = f"{name} {desc or ''}".lower()
+    text = f"{name} {desc or ''} {' '.join(topics or [])}".lower()
     full_text = f"{name} {desc or ''}"
 
     if has_non_latin(full_text):
@@ -304,28 +500,85 @@ def quick_filter(name, desc, stars=0):
     return False
 
 def is_likely_fork_spam(item):
-    if not item.get('fork'):
+    if not item.fork:
         return False
-    if item.get('stargazers_count', 0) == 0 and item.get('forks_count', 0) == 0:
+    if item.stars == 0 and item.forks == 0:
         return True
+    # Родитель известен после enrich_repos: форк отслеживаемого проекта
+    # или репо доверенного автора — копия того, что и так публикуется
+    if item.parent:
+        parent = item.parent.lower()
+        if parent in TRACKED_REPO_NAMES or parent.split('/', 1)[0] in WATCHED_OWNER_NAMES:
+            return True
     return False
 
+# ============ REPO RECORDS ============
+
+class RepoRecord:
+    """
+    Компактная запись о репозитории из поиска/листинга GitHub: только используемые
+    поля, даты разобраны один раз. Поля обогащения заполняет enrich_repos().
+    """
+    __slots__ = (
+        "id", "full_name", "description", "stars", "forks", "fork", "html_url",
+        "pushed_ts", "created_ts", "updated_ts", "topics",
+        "enriched", "readme", "language", "parent", "velocity",
+    )
+
+    def __init__(self, data):
+        self.id = data['id']
+        self.full_name = data['full_name']
+        self.description = data.get('description')
+        self.stars = data.get('stargazers_count', 0)
+        self.forks = data.get('forks_count', 0)
+        self.fork = data.get('fork', False)
+        self.html_url = data.get('html_url', f"https://github.com/{data['full_name']}")
+        self.pushed_ts = to_epoch(data.get('pushed_at'))
+        self.created_ts = to_epoch(data.get('created_at'))
+        self.updated_ts = to_epoch(data.get('updated_at'))
+        self.topics = data.get('topics') or []
+        self.enriched = False
+        self.readme = None
+        self.language = data.get('language')
+        self.parent = None
+        self.velocity = None
+
+    @property
+    def owner(self):
+        return self.full_name.split('/', 1)[0]
+
+    def __repr__(self):
+        return f"RepoRecord({self.full_name!r}, stars={self.stars})"
+
+def repo_record_hook(obj):
+    """
+    object_hook для json.loads: объекты репозиториев сразу становятся RepoRecord,
+    а вложенные owner/license/permissions отбрасываются вместе с исходным dict.
+    """
+    if 'full_name' in obj and 'stargazers_count' in obj:
+        return RepoRecord(obj)
+    return obj
+
+def parse_repos_json(raw):
+    return json.loads(raw, object_hook=repo_record_hook)
+
 # ============ GITHUB API FUNCTIONS (ASYNC) ============
 
 async def get_default_branch(session, owner, repo):
     """Получить default branch через API"""
-    url = f"https://api.github.com/repos/{owner}/{repo}"
-    try:
-        async with session.get(url) as resp:
-            if resp.status == 200:
-                data = await resp.json()
-                return data.get('default_branch', 'main')
-    except Exception as e:
-        logger.debug(f"Error getting default branch for {owner}/{repo}: {e}")
+    status, data, _ = await github_get_json_async(session, f"https://api.github.com/repos/{owner}/{repo}")
+    if status == 200 and data:
+        return data.get('default_branch', 'main')
     return 'main'
 
-async def fetch_repo_text_async(owner, repo):
-    """Асинхронная загрузка README с правильным определением ветки"""
+async def stream_repo_readme(owner, repo, consume, max_bytes=README_MAX_BYTES):
+    """
+    Потоковое чтение README: куски декодируются инкрементально и отдаются в consume(chunk).
+    Чтение прекращается, если consume вернул True или прочитано max_bytes.
+    Возвращает True, если README найден. После первого ответа 200 другие URL
+    не пробуются: обрыв посреди потока оставляет consume с частичным текстом.
+    """
+    import aiohttp
     try:
         async with aiohttp.ClientSession(headers=API_HEADERS) as session:
             # Сначала получаем default branch
@@ -337,29 +590,46 @@ async def fetch_repo_text_async(owner, repo):
                 f"https://raw.githubusercontent.com/{owner}/{repo}/master/README.md",
             ]
             
+            streamed = False
             for url in urls:
                 try:
                     async with session.get(url, timeout=aiohttp.ClientTimeout(total=8)) as resp:
-                        if resp.status == 200:
-                            text = await resp.text()
-                            logger.debug(f"   ✅ README loaded from {url}")
-                            return text
+                        if resp.status != 200:
+                            continue
+                        streamed = True
+                        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+                        read = 0
+                        async for raw in resp.content.iter_chunked(README_CHUNK_SIZE):
+                            raw = raw[:max_bytes - read]
+                            read += len(raw)
+                            if consume(decoder.decode(raw)) or read >= max_bytes:
+                                logger.debug(f"   ✂️ README stream stopped at {read} bytes: {url}")
+                                return True
+                        consume(decoder.decode(b'', final=True))
+                        logger.debug(f"   ✅ README loaded from {url} ({read} bytes)")
+                        return True
                 except asyncio.TimeoutError:
                     logger.debug(f"   ⏱ Timeout loading {url}")
-                    continue
                 except Exception as e:
                     logger.debug(f"   ⚠️ Error loading {url}: {e}")
-                    continue
-                    
+                if streamed:
+                    return True
+
     except Exception as e:
         logger.debug(f"Error fetching README for {owner}/{repo}: {e}")
-    
-    return ""
+
+    return False
+
+async def fetch_repo_text_async(owner, repo, max_bytes=README_MAX_BYTES):
+    """Асинхронная загрузка README целиком (не больше max_bytes)"""
+    parts = []
+    await stream_repo_readme(owner, repo, parts.append, max_bytes)
+    return "".join(parts)
 
 def get_latest_release(owner, repo):
     url = f"https://api.github.com/repos/{owner}/{repo}/releases/latest"
     try:
-        resp = requests.get(url, headers=API_HEADERS, timeout=10)
+        resp = github_get(url, timeout=10)
         if resp.status_code == 200:
             r = resp.json()
             return {
@@ -376,14 +646,15 @@ def get_latest_release(owner, repo):
         logger.debug(f"Error getting release for {owner}/{repo}: {e}")
     return None
 
-def get_recent_releases(owner, repo, limit=5):
+def get_recent_releases(owner, repo, limit=5, max_age_hours=None):
+    """Свежие релизы; None — запрос не удался (в отличие от «релизов нет»)"""
     url = f"https://api.github.com/repos/{owner}/{repo}/releases?per_page={limit}"
     try:
-        resp = requests.get(url, headers=API_HEADERS, timeout=10)
+        resp = github_get(url, timeout=10)
         if resp.status_code == 200:
             releases = []
             for r in resp.json():
-                if is_fresh(r.get('published_at', r.get('created_at'))):
+                if is_fresh(r.get('published_at', r.get('created_at')), max_age_hours):
                     releases.append({
                         "tag": r.get('tag_name', ''),
                         "name": r.get('name', r.get('tag_name', '')),
@@ -395,18 +666,21 @@ def get_recent_releases(owner, repo, limit=5):
             return releases
     except Exception as e:
         logger.debug(f"Error getting releases for {owner}/{repo}: {e}")
-    return []
+    return None
 
 def get_last_commit(owner, repo):
+    """Голова default branch; {} — коммитов нет или он не публикуется, None — ошибка запроса"""
     url = f"https://api.github.com/repos/{owner}/{repo}/commits?per_page=1"
     try:
-        resp = requests.get(url, headers=API_HEADERS, timeout=10)
-        if resp.status_code == 200 and resp.json():
+        resp = github_get(url, timeout=10)
+        if resp.status_code == 200:
+            if not resp.json():
+                return {}
             c = resp.json()[0]
             msg = c['commit']['message'].split('\n')[0][:60]
 
             if has_non_latin(msg):
-                return None
+                return {}
 
             return {
                 "sha": c['sha'][:7],
@@ -418,6 +692,70 @@ def get_last_commit(owner, repo):
         logger.debug(f"Error getting commit for {owner}/{repo}: {e}")
     return None
 
+def fetch_compare_page(owner, repo, base_sha, head_sha, page):
+    url = (
+        f"https://api.github.com/repos/{owner}/{repo}/compare/{base_sha}...{head_sha}"
+        f"?per_page={COMMIT_RANGE_PAGE_SIZE}&page={page}"
+    )
+    try:
+        resp = github_get(url, timeout=15)
+        if resp.status_code != 200:
+            logger.debug(f"   compare {owner}/{repo} {base_sha}...{head_sha}: HTTP {resp.status_code}")
+            return None
+        return resp.json()
+    except Exception as e:
+        logger.debug(f"Error comparing commits for {owner}/{repo}: {e}")
+        return None
+
+def get_commit_range(owner, repo, base_sha, head_sha):
+    """
+    Все коммиты base_sha..head_sha одним compare-запросом (с пагинацией).
+    Страницы compare идут от старых к новым, поэтому при большом диапазоне
+    берём последние COMMIT_RANGE_MAX_PAGES страниц, а не первые.
+    None — если base неизвестен GitHub (force-push, первый запуск).
+    """
+    first = fetch_compare_page(owner, repo, base_sha, head_sha, 1)
+    if first is None:
+        return None
+
+    total = first.get('total_commits', 0)
+    compare_url = first.get('html_url', "")
+    last_page = max(math.ceil(total / COMMIT_RANGE_PAGE_SIZE), 1)
+    start_page = max(last_page - COMMIT_RANGE_MAX_PAGES + 1, 1)
+
+    pages = [first] if start_page == 1 else []
+    for page in range(max(start_page, 2), last_page + 1):
+        data = fetch_compare_page(owner, repo, base_sha, head_sha, page)
+        if data is None:
+            return None
+        pages.append(data)
+
+    commits = [
+        {
+            "sha": c['sha'][:7],
+            "date": c['commit']['committer']['date'],
+            "msg": c['commit']['message'].split('\n')[0][:60],
+            "url": c['html_url']
+        }
+        for data in pages for c in data.get('commits', [])
+    ]
+    if not commits:
+        return None
+    # compare отдаёт от старых к новым
+    commits.reverse()
+    return {"commits": commits, "total": max(total, len(commits)), "url": compare_url}
+
+def get_new_commits(owner, repo, known_sha):
+    """
+    Новые коммиты с последнего запуска: голова (1 запрос) и, если она сдвинулась,
+    весь диапазон через compare. Возвращает (head, range или None);
+    head None — запрос не удался, {} — публиковать нечего.
+    """
+    head = get_last_commit(owner, repo)
+    if not head or not known_sha or known_sha == head['sha']:
+        return head, None
+    return head, get_commit_range(owner, repo, known_sha, head['sha'])
+
 def search_fresh_repos(query, per_page=40):
     date_filter = (datetime.now(timezone.utc) - timedelta(days=MAX_AGE_DAYS)).strftime('%Y-%m-%d')
 
@@ -436,12 +774,12 @@ def search_fresh_repos(query, per_page=40):
         )
 
         try:
-            resp = requests.get(url, headers=API_HEADERS, timeout=15)
+            resp = github_get(url, timeout=15)
             if resp.status_code == 200:
-                for item in resp.json().get('items', []):
-                    if item['id'] not in seen_ids:
-                        seen_ids.add(item['id'])
-                        if is_fresh(item.get('pushed_at')) or is_fresh(item.get('updated_at')):
+                for item in parse_repos_json(resp.content).get('items', []):
+                    if item.id not in seen_ids:
+                        seen_ids.add(item.id)
+                        if is_fresh(item.pushed_ts) or is_fresh(item.updated_ts):
                             results.append(item)
             elif resp.status_code == 403:
                 logger.warning("⚠️ GitHub API rate limit!")
@@ -451,6 +789,304 @@ def search_fresh_repos(query, per_page=40):
 
     return results
 
+async def fetch_owner_new_repos(session, owner, owner_state):
+    """
+    Новые репозитории владельца (sort=created) до последнего виденного id.
+    Первая страница запрашивается с If-None-Match: 304 не тратит лимит.
+    При первом знакомстве с владельцем только запоминаем точку отсчёта.
+    """
+    last_id = owner_state.get("last_id", 0)
+    new = []
+    for page in range(1, OWNER_MAX_PAGES + 1):
+        url = (
+            f"https://api.github.com/users/{owner}/repos"
+            f"?sort=created&direction=desc&per_page={OWNER_PAGE_SIZE}&page={page}"
+        )
+        etag = owner_state.get("etag") if page == 1 else None
+        status, repos, new_etag = await github_get_json_async(session, url, etag=etag, loads=parse_repos_json)
+        if status == 304:
+            return []
+        if status != 200:
+            logger.debug(f"   {owner}: HTTP {status}")
+            break
+        if page == 1:
+            owner_state["etag"] = new_etag
+
+        fresh = [r for r in repos if r.id > last_id]
+        new.extend(fresh)
+        # Без точки отсчёта нужен только максимальный id — он на первой странице
+        if not last_id or len(fresh) < len(repos) or len(repos) < OWNER_PAGE_SIZE:
+            break
+
+    if new:
+        owner_state["last_id"] = max(last_id, max(r.id for r in new))
+    return new if last_id else []
+
+def is_rejected_repo(full_name, repo_cache):
+    return repo_cache.get(f"relevance:{full_name}") is False
+
+async def fetch_owner_pending_repos(session, owner, state):
+    """
+    Новые репо владельца сначала попадают в owners[owner]["pending"] ({id: full_name})
+    и остаются там, пока не опубликованы, не отклонены по README или не устарели.
+    Курсор last_id и ETag двигаются сразу, а репо, проигравшие бюджет, не
+    доставленные или пока без README, на следующем запуске берутся из pending.
+    """
+    owner_state = state["owners"].setdefault(owner, {})
+    pending = owner_state.setdefault("pending", {})
+    items = {str(r.id): r for r in await fetch_owner_new_repos(session, owner, owner_state)}
+
+    for repo_id, full_name in list(pending.items()):
+        if repo_id in items:
+            continue
+        if repo_id in state["posted"] or is_rejected_repo(full_name, state["repo_cache"]):
+            del pending[repo_id]
+            continue
+        status, item, _ = await github_get_json_async(
+            session, f"https://api.github.com/repos/{full_name}", loads=parse_repos_json
+        )
+        if status == 200:
+            items[repo_id] = item
+        elif status == 404:
+            del pending[repo_id]
+
+    fresh = []
+    for repo_id, item in items.items():
+        if (repo_id in state["posted"] or is_likely_fork_spam(item)
+                or not is_fresh(item.created_ts)
+                or is_rejected_repo(item.full_name, state["repo_cache"])):
+            pending.pop(repo_id, None)
+            continue
+        pending[repo_id] = item.full_name
+        fresh.append(item)
+    return fresh
+
+# ============ GRAPHQL ENRICHMENT ============
+# README, топики, язык и родитель форка для пачки репо одним запросом
+# вместо REST default_branch + до трёх raw-загрузок README на каждого кандидата.
+
+GRAPHQL_URL = "https://api.github.com/graphql"
+ENRICH_BATCH_SIZE = 25
+
+# full_name (lower) -> поля обогащения; один репо из разных запросов обогащается один раз
+_enrich_memo = {}
+
+ENRICH_FRAGMENT = """
+fragment RepoFields on Repository {
+  readme: object(expression: "HEAD:README.md") { ... on Blob { text } }
+  repositoryTopics(first: 20) { nodes { topic { name } } }
+  primaryLanguage { name }
+  parent { nameWithOwner }
+}
+"""
+
+def github_graphql(query, variables):
+    REQUEST_STATS["sent"] += 1
+    try:
+        resp = get_http().post(GRAPHQL_URL, json={"query": query, "variables": variables}, timeout=30)
+        if resp.status_code != 200:
+            logger.warning(f"⚠️ GraphQL HTTP {resp.status_code}")
+            return None
+        body = resp.json()
+        # Частичные ошибки (удалённый/переименованный репо) не мешают остальным алиасам
+        if body.get("errors"):
+            logger.debug(f"GraphQL errors: {body['errors'][:3]}")
+        return body.get("data")
+    except Exception as e:
+        logger.warning(f"⚠️ GraphQL error: {e}")
+        return None
+
+def build_enrich_query(full_names):
+    params = ", ".join(f"$o{n}: String!, $n{n}: String!" for n in range(len(full_names)))
+    aliases = "\n".join(
+        f"  r{n}: repository(owner: $o{n}, name: $n{n}) {{ ...RepoFields }}"
+        for n in range(len(full_names))
+    )
+    variables = {}
+    for n, full_name in enumerate(full_names):
+        variables[f"o{n}"], variables[f"n{n}"] = full_name.split("/", 1)
+    return f"query({params}) {{\n{aliases}\n}}\n{ENRICH_FRAGMENT}", variables
+
+def apply_enrichment(item, fields):
+    item.enriched = True
+    item.readme = fields["readme"]
+    item.topics = fields["topics"] or item.topics
+    item.language = fields["language"] or item.language
+    item.parent = fields["parent"]
+
+async def enrich_repos(items):
+    """
+    Дополняет RepoRecord полями readme ("" — README.md нет, None — не обогащён), topics,
+    language, parent. README обрезается до README_MAX_BYTES. Уже обогащённые пропускаются, уже
+    запрошенные в этом запуске берутся из _enrich_memo.
+    """
+    todo = []
+    for item in items:
+        if item.enriched:
+            continue
+        fields = _enrich_memo.get(item.full_name.lower())
+        if fields is not None:
+            apply_enrichment(item, fields)
+        else:
+            todo.append(item)
+
+    for batch_start in range(0, len(todo), ENRICH_BATCH_SIZE):
+        batch = todo[batch_start:batch_start + ENRICH_BATCH_SIZE]
+        query, variables = build_enrich_query([i.full_name for i in batch])
+        data = await asyncio.to_thread(github_graphql, query, variables)
+        if not data:
+            continue
+
+        for n, item in enumerate(batch):
+            repo = data.get(f"r{n}")
+            if not repo:
+                continue
+            # "" отличает «README.md нет» от «не обогащён»: повторно его не ищем
+            readme = (repo.get('readme') or {}).get('text') or ""
+            if len(readme) > README_MAX_BYTES // 4:
+                readme = readme.encode('utf-8')[:README_MAX_BYTES].decode('utf-8', 'ignore')
+            fields = {
+                "readme": readme,
+                "topics": [t['topic']['name'] for t in (repo.get('repositoryTopics') or {}).get('nodes', [])],
+                "language": (repo.get('primaryLanguage') or {}).get('name'),
+                "parent": (repo.get('parent') or {}).get('nameWithOwner'),
+            }
+            _enrich_memo[item.full_name.lower()] = fields
+            apply_enrichment(item, fields)
+        logger.info(f"   🧬 Enriched {len(batch)} repos in one GraphQL query")
+
+# ============ STAR VELOCITY ============
+# Компактный временной ряд: stars[repo_id] = [[ts, stars, forks], ...],
+# снимки берутся из уже полученных результатов поиска, без доп. запросов.
+
+def record_star_snapshots(history, items, now=None):
+    now = int(now or datetime.now(timezone.utc).timestamp())
+    for item in items:
+        point = [now, item.stars, item.forks]
+        points = history.setdefault(str(item.id), [])
+        # Один репо в нескольких запросах за запуск — перезаписываем последний снимок
+        if points and now - points[-1][0] < STAR_SNAPSHOT_MIN_INTERVAL:
+            points[-1] = point
+        else:
+            points.append(point)
+        del points[:-STAR_HISTORY_MAX_POINTS]
+
+def prune_star_history(history, now=None):
+    cutoff = (now or datetime.now(timezone.utc).timestamp()) - STAR_HISTORY_MAX_AGE_DAYS * 86400
+    for repo_id in [k for k, pts in history.items() if not pts or pts[-1][0] < cutoff]:
+        del history[repo_id]
+
+def merge_star_history(dst, src):
+    for repo_id, points in src.items():
+        merged = {p[0]: p for p in dst.get(repo_id, []) + points}
+        dst[repo_id] = [merged[ts] for ts in sorted(merged)][-STAR_HISTORY_MAX_POINTS:]
+
+def star_velocity(items, history, now=None):
+    """
+    Скорость (звёзд/день) и ускорение (звёзд/день²) сразу для всех кандидатов.
+    Считается по колонкам: последние три снимка каждого репо;
+    без истории — звёзды / возраст репозитория (только для ранжирования).
+    measured[i] — скорость измерена по двум и более снимкам.
+    """
+    now = now or datetime.now(timezone.utc).timestamp()
+    series = [history.get(str(i.id), []) for i in items]
+    stars = [i.stars for i in items]
+    created = [i.created_ts or now for i in items]
+
+    # Добавляем текущую точку, если её ещё нет в истории
+    series = [
+        pts if pts and pts[-1][0] >= now - STAR_SNAPSHOT_MIN_INTERVAL else pts + [[now, s, 0]]
+        for pts, s in zip(series, stars)
+    ]
+
+    def rate(a, b):
+        return (b[1] - a[1]) / max((b[0] - a[0]) / 86400, 1 / 24)
+
+    rates = [
+        rate(pts[-2], pts[-1]) if len(pts) >= 2 else s / max((now - c) / 86400, 0.25)
+        for pts, s, c in zip(series, stars, created)
+    ]
+    prev_rates = [rate(pts[-3], pts[-2]) if len(pts) >= 3 else r for pts, r in zip(series, rates)]
+    spans = [max((pts[-1][0] - pts[-2][0]) / 86400, 1 / 24) if len(pts) >= 2 else 1 for pts in series]
+    accels = [(r - p) / d for r, p, d in zip(rates, prev_rates, spans)]
+    measured = [len(pts) >= 2 for pts in series]
+    return rates, accels, measured
+
+def trending_scores(items, history, now=None):
+    """
+    Трендовый скор: log-скорость роста плюс знаковый log-бонус за ускорение.
+    Вторым списком — скорость для поста: None, если она не измерена по снимкам
+    (средняя за всю жизнь репо — не текущий рост).
+    """
+    rates, accels, measured = star_velocity(items, history, now)
+    return [
+        math.log1p(max(r, 0)) + 0.5 * math.copysign(math.log1p(abs(a)), a)
+        for r, a in zip(rates, accels)
+    ], [r if m else None for r, m in zip(rates, measured)]
+
+# ============ ADAPTIVE POLLING ============
+# Для каждого отслеживаемого репо (отдельно релизы и коммиты) храним моменты
+# наблюдённых изменений: schedule[key] = {"since", "last_poll", "events": [...]}.
+# Изменения считаем пуассоновским потоком с интенсивностью λ (гамма-априор:
+# POLL_PRIOR_EVENTS изменений за POLL_PRIOR_DAYS дней), P(изменение с прошлого
+# опроса) = 1 - exp(-λ·Δt). Опрашиваем, если P × вес ≥ POLL_EV_THRESHOLD
+# или репо не опрашивали дольше POLL_MAX_STALENESS_DAYS.
+
+POLL_EV_THRESHOLD = 0.1
+POLL_MAX_STALENESS_DAYS = 14
+POLL_PRIOR_EVENTS = 1
+POLL_PRIOR_DAYS = 7
+POLL_HISTORY_EVENTS = 20
+
+def change_rate(entry, now):
+    """Оценка λ (изменений в день) по наблюдениям и априорному значению"""
+    events = entry.get("events", [])
+    start = entry.get("since", now)
+    # Если история обрезана, окно наблюдения начинается с самого старого события
+    if len(events) >= POLL_HISTORY_EVENTS:
+        start = events[0]
+    span_days = max(now - start, 0) / 86400
+    return (len(events) + POLL_PRIOR_EVENTS) / (span_days + POLL_PRIOR_DAYS)
+
+def poll_value(schedule, key, weight, now=None):
+    """Ожидаемая ценность опроса; inf — опрос обязателен (новый или давно не опрашивали)"""
+    now = now or datetime.now(timezone.utc).timestamp()
+    entry = schedule.get(key)
+    if not entry or not entry.get("last_poll"):
+        return math.inf
+    dt_days = (now - entry["last_poll"]) / 86400
+    if dt_days >= POLL_MAX_STALENESS_DAYS:
+        return math.inf
+    return (1 - math.exp(-change_rate(entry, now) * dt_days)) * weight
+
+def should_poll(schedule, key, weight, now=None):
+    return poll_value(schedule, key, weight, now) >= POLL_EV_THRESHOLD
+
+def poll_max_age_hours(schedule, key, now=None):
+    """
+    Окно свежести для релизов/коммитов: после пропущенных опросов — с момента
+    прошлого опроса (но не дальше POLL_MAX_STALENESS_DAYS), иначе MAX_AGE_DAYS
+    """
+    now = now or datetime.now(timezone.utc).timestamp()
+    last_poll = schedule.get(key, {}).get("last_poll")
+    since_poll = (now - last_poll) / 3600 if last_poll else 0
+    return max(MAX_AGE_DAYS * 24, min(since_poll, POLL_MAX_STALENESS_DAYS * 24))
+
+def record_poll(schedule, key, event_dates=(), now=None):
+    """Отмечаем опрос и изменения, найденные с прошлого (даты коммитов/релизов)"""
+    now = now or datetime.now(timezone.utc).timestamp()
+    entry = schedule.setdefault(key, {"since": now, "events": []})
+    entry["last_poll"] = now
+    # События до начала наблюдения не учитываем: это история, а не поток изменений
+    new = [ts for ts in (to_epoch(d) for d in event_dates) if ts and ts >= entry["since"]]
+    if new:
+        entry["events"] = sorted(set(entry["events"]) | set(new))[-POLL_HISTORY_EVENTS:]
+
+def merge_schedule(dst, src):
+    for key, entry in src.items():
+        if entry.get("last_poll", 0) >= dst.get(key, {}).get("last_poll", 0):
+            dst[key] = entry
+
 # ============ STATE MANAGEMENT ============
 
 def load_state():
@@ -464,12 +1100,13 @@ def load_state():
                 return data
         except Exception as e:
             logger.warning(f"Could not load state: {e}")
-    return {"posted": [], "commits": {}, "releases": {}, "repo_cache": {}, "last_run": None}
+    return {"posted": [], "commits": {}, "releases": {}, "repo_cache": {}, "stars": {}, "delivered": {}, "owners": {}, "schedule": {}, "last_run": None}
 
 def save_state(state):
     state['last_run'] = datetime.now(timezone.utc).isoformat()
     # Обрезаем при сохранении для надёжности
     state['posted'] = state.get('posted', [])[-3000:]
+    state['delivered'] = {k: v[-3000:] for k, v in state.get('delivered', {}).items()}
     try:
         with open(STATE_FILE, "w", encoding='utf-8') as f:
             json.dump(state, f, indent=2, ensure_ascii=False)
@@ -477,6 +1114,35 @@ def save_state(state):
     except Exception as e:
         logger.error(f"❌ Could not save state: {e}")
 
+def load_run_state():
+    """Состояние в рабочем виде: posted — множество, плюс буферы текущего запуска"""
+    loaded = load_state()
+    return {
+        "posted": set(loaded.get("posted", [])),
+        "commits": loaded.get("commits", {}),
+        "releases": loaded.get("releases", {}),
+        "repo_cache": loaded.get("repo_cache", {}),
+        "stars": loaded.get("stars", {}),
+        "delivered": {k: set(v) for k, v in loaded.get("delivered", {}).items()},
+        "owners": loaded.get("owners", {}),
+        "schedule": loaded.get("schedule", {}),
+        "outbox": [],
+        "config_sources": set(),
+    }
+
+def save_run_state(state):
+    prune_star_history(state["stars"])
+    save_state({
+        "posted": list(state["posted"]),
+        "commits": state["commits"],
+        "releases": state["releases"],
+        "repo_cache": state["repo_cache"],
+        "stars": state["stars"],
+        "delivered": {k: list(v) for k, v in state["delivered"].items()},
+        "owners": state["owners"],
+        "schedule": state["schedule"]
+    })
+
 def load_config_sources():
     if os.path.exists(CONFIG_SOURCES_FILE):
         try:
@@ -502,7 +1168,9 @@ async def analyze_relevance(repos):
         return {}
 
     text = "\n".join([
-        f"{i+1}. {r['full_name']} | ⭐{r['stargazers_count']} | {safe_desc(r['description'], 80)}"
+        f"{i+1}. {r.full_name} | ⭐{r.stars} | {safe_desc(r.description, 80)}"
+        + (f" | {r.language}" if r.language else "")
+        + (f" | #{' #'.join(r.topics[:8])}" if r.topics else "")
         for i, r in enumerate(repos)
     ])
 
@@ -531,7 +1199,7 @@ async def analyze_relevance(repos):
 ..."""
 
     try:
-        resp = groq_client.chat.completions.create(
+        resp = get_groq().chat.completions.create(
             model="llama-3.1-8b-instant",
             messages=[{"role": "user", "content": prompt}],
             max_tokens=200,
@@ -552,39 +1220,116 @@ async def analyze_relevance(repos):
         logger.warning(f"⚠️ AI error: {e}")
         return {i: True for i in range(1, len(repos) + 1)}
 
-async def generate_desc(name, desc):
-    if desc and len(desc) > 25 and not has_non_latin(desc):
-        return desc
-
-    prompt = f"""Репозиторий: {name}
-Описание: {desc or 'нет'}
+def needs_generated_desc(desc):
+    return not (desc and len(desc) > 25 and not has_non_latin(desc))
 
-Напиши краткое описание (1 предложение, до 80 символов) на русском.
+async def generate_descs(repos):
+    """
+    Описания для всех репо сразу: один запрос на DESC_BATCH_SIZE репо,
+    ответ по строкам "N: описание". Строка проверяется has_non_latin;
+    если её нет или она невалидна — описание по умолчанию только для этого репо.
+    repos — список (full_name, description); возвращает список описаний того же порядка.
+    """
+    result = [desc if not needs_generated_desc(desc) else None for _, desc in repos]
+    todo = [i for i, d in enumerate(result) if d is None]
+
+    for batch_start in range(0, len(todo), DESC_BATCH_SIZE):
+        batch = todo[batch_start:batch_start + DESC_BATCH_SIZE]
+        text = "\n".join(
+            f"{n}. {repos[i][0]} | {safe_desc(repos[i][1], 120) or 'нет описания'}"
+            for n, i in enumerate(batch, 1)
+        )
+        prompt = f"""Для каждого репозитория напиши краткое описание (1 предложение, до 80 символов) на русском.
 Контекст: VPN, обход блокировок.
 
-Описание:"""
+Репозитории:
+{text}
 
-    try:
-        resp = groq_client.chat.completions.create(
-            model="llama-3.1-8b-instant",
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=60,
-            temperature=0.3
-        )
-        generated = resp.choices[0].message.content.strip()
-        if generated and not has_non_latin(generated):
-            return generated
-    except Exception as e:
-        logger.debug(f"Error generating description: {e}")
+Ответь строго по строке на каждый, в том же порядке:
+1: описание
+2: описание
+..."""
 
-    return "Инструмент для обхода блокировок"
+        try:
+            resp = await asyncio.to_thread(
+                get_groq().chat.completions.create,
+                model="llama-3.1-8b-instant",
+                messages=[{"role": "user", "content": prompt}],
+                max_tokens=60 * len(batch),
+                temperature=0.3
+            )
+            for line in resp.choices[0].message.content.split('\n'):
+                # Только формат ответа "N: ..."; строки промпта "N. name | desc" не подходят
+                m = re.match(r'\s*(\d+)\s*:\s*(.+)', line)
+                if not m:
+                    continue
+                n = int(m.group(1))
+                if not 1 <= n <= len(batch):
+                    continue
+                generated = m.group(2).strip().strip('"')
+                # Эхо промпта: имя репо или разделитель "|" в описании
+                if '|' in generated or repos[batch[n - 1]][0].lower() in generated.lower():
+                    continue
+                if generated and not has_non_latin(generated):
+                    result[batch[n - 1]] = generated[:120]
+        except Exception as e:
+            logger.debug(f"Error generating descriptions: {e}")
+
+        logger.info(f"   📝 Descriptions: {len(batch)} repos in one request")
+        if batch_start + DESC_BATCH_SIZE < len(todo):
+            await asyncio.sleep(GROQ_DELAY)
+
+    return [d or DEFAULT_DESC for d in result]
+
+README_REQUIRED_TERMS = [
+    'vpn', 'proxy', 'bypass', 'censorship', 'dpi',
+    'vless', 'vmess', 'xray', 'v2ray', 'shadowsocks',
+    'trojan', 'hysteria', 'wireguard', 'clash', 'sing-box',
+    'zapret', 'rkn', 'roskomnadzor', 'sorm', 'tspu',
+]
+
+README_BAD_SIGNS = [
+    'vocabulary trainer', 'language learning', 'flashcard',
+    'steel market', 'commodity market', 'stock market',
+    'cooking recipe', 'restaurant', 'shopping cart', 'ecommerce',
+]
+
+class RelevanceScanner:
+    """
+    Инкрементальный поиск README_REQUIRED_TERMS и README_BAD_SIGNS.
+    Хвост предыдущего куска сохраняется, чтобы термин на границе не потерялся.
+    feed() возвращает True, когда вердикт уже не изменится (найден bad sign).
+    """
+
+    def __init__(self):
+        self.required = False
+        self.bad = False
+        self.seen_text = False
+        self._tail = ""
+        self._overlap = max(len(t) for t in README_REQUIRED_TERMS + README_BAD_SIGNS) - 1
+
+    def feed(self, chunk):
+        if not chunk:
+            return self.bad
+        self.seen_text = self.seen_text or bool(chunk.strip())
+        window = self._tail + chunk.lower()
+        if not self.required:
+            self.required = any(term in window for term in README_REQUIRED_TERMS)
+        if any(sign in window for sign in README_BAD_SIGNS):
+            self.bad = True
+        self._tail = window[-self._overlap:]
+        return self.bad
 
 # финальная проверка репо по README (теперь async)
-async def check_repo_relevance(owner: str, repo: str, repo_cache: dict) -> bool:
+async def check_repo_relevance(owner: str, repo: str, repo_cache: dict,
+                               readme: str = None, topics: list = None,
+                               cache_missing: bool = True) -> bool:
     """
     Финальная валидация: проверяем README на VPN/DPI-контекст,
     чтобы не публиковать vocabulary-trainer, steel-market и т.п.
-    С кэшированием результатов.
+    С кэшированием результатов. README из GraphQL-обогащения (включая ""
+    — README.md нет) используется без повторной загрузки; VPN-термин в топиках засчитывается как в README.
+    cache_missing=False — отсутствие/пустой README не кэшируется (README может появиться позже).
     """
     cache_key = f"relevance:{owner}/{repo}"
     
@@ -592,31 +1337,25 @@ async def check_repo_relevance(owner: str, repo: str, repo_cache: dict) -> bool:
     if cache_key in repo_cache:
         return repo_cache[cache_key]
     
-    text = await fetch_repo_text_async(owner, repo)
-    if not text:
-        repo_cache[cache_key] = False
+    scanner = RelevanceScanner()
+    if readme is not None:
+        found = True
+        scanner.feed(readme[:README_SCAN_MAX_BYTES])
+    else:
+        found = await stream_repo_readme(owner, repo, scanner.feed, README_SCAN_MAX_BYTES)
+    if not found or not scanner.seen_text:
+        if cache_missing:
+            repo_cache[cache_key] = False
         return False
 
-    low = text.lower()
-
-    required_terms = [
-        'vpn', 'proxy', 'bypass', 'censorship', 'dpi',
-        'vless', 'vmess', 'xray', 'v2ray', 'shadowsocks',
-        'trojan', 'hysteria', 'wireguard', 'clash', 'sing-box',
-        'zapret', 'rkn', 'roskomnadzor', 'sorm', 'tspu',
-    ]
-    if not any(term in low for term in required_terms):
-        logger.debug(f"   ❌ No VPN/DPI terms in README: {owner}/{repo}")
+    if scanner.bad:
+        logger.debug(f"   ❌ Irrelevant content in README: {owner}/{repo}")
         repo_cache[cache_key] = False
         return False
 
-    bad_signs = [
-        'vocabulary trainer', 'language learning', 'flashcard',
-        'steel market', 'commodity market', 'stock market',
-        'cooking recipe', 'restaurant', 'shopping cart', 'ecommerce',
-    ]
-    if any(sign in low for sign in bad_signs):
-        logger.debug(f"   ❌ Irrelevant content in README: {owner}/{repo}")
+    topics_text = " ".join(topics or []).lower()
+    if not scanner.required and not any(term in topics_text for term in README_REQUIRED_TERMS):
+        logger.debug(f"   ❌ No VPN/DPI terms in README: {owner}/{repo}")
         repo_cache[cache_key] = False
         return False
 
@@ -625,14 +1364,23 @@ async def check_repo_relevance(owner: str, repo: str, repo_cache: dict) -> bool:
 
 # ============ TELEGRAM ============
 
-async def send_message_safe(chat_id, text):
+async def send_message_safe(chat_id, text, thread_id=None):
     if has_non_latin(text):
         logger.warning("⚠️ Blocked message with hieroglyphs!")
         return False
 
+    if DRY_RUN:
+        topic = f"/{thread_id}" if thread_id else ""
+        logger.info(f"   🧪 [dry-run] → {chat_id}{topic}\n{text}\n")
+        return True
+
+    from aiogram.exceptions import TelegramRetryAfter, TelegramForbiddenError
+
     for attempt in range(3):
         try:
-            await bot.send_message(chat_id, text, disable_web_page_preview=True)
+            await get_bot().send_message(
+                chat_id, text, message_thread_id=thread_id, disable_web_page_preview=True
+            )
             return True
         except TelegramRetryAfter as e:
             logger.warning(f"⚠️ Flood control: waiting {e.retry_after}s")
@@ -645,6 +1393,46 @@ async def send_message_safe(chat_id, text):
             await asyncio.sleep(2 ** attempt)
     return False
 
+def get_destinations():
+    dests = []
+    for d in DESTINATIONS:
+        value = os.getenv(d["env"])
+        if not value:
+            continue
+        chat_id, _, thread_id = value.partition("/")
+        dests.append(dict(d, chat_id=chat_id, thread_id=int(thread_id) if thread_id else None))
+    # В dry-run каналы не нужны: рендерим каждый пост один раз в заглушку
+    if DRY_RUN and not dests:
+        dests.append({"name": "dry-run", "env": None, "chat_id": "dry-run", "thread_id": None})
+    return dests
+
+def destination_accepts(dest, entry):
+    if dest.get("stages") and entry["stage"] not in dest["stages"]:
+        return False
+    if dest.get("priorities") and entry.get("priority") not in dest["priorities"]:
+        return False
+    if dest.get("searches") and entry["stage"] == "search" and entry.get("search_name") not in dest["searches"]:
+        return False
+    return True
+
+# Ограничение частоты по каждому чату: отправки в один чат идут по очереди
+# с паузой MESSAGE_DELAY, в разные чаты — параллельно
+_chat_locks = {}
+_chat_last_send = {}
+
+async def send_to_destination(dest, text):
+    lock = _chat_locks.setdefault(dest["chat_id"], asyncio.Lock())
+    async with lock:
+        loop = asyncio.get_running_loop()
+        wait = _chat_last_send.get(dest["chat_id"], 0) + MESSAGE_DELAY - loop.time()
+        if wait > 0 and not DRY_RUN:
+            await asyncio.sleep(wait)
+        success = await send_message_safe(dest["chat_id"], text, dest["thread_id"])
+        _chat_last_send[dest["chat_id"]] = loop.time()
+    if not success:
+        logger.warning(f"⚠️ Delivery to {dest['name']} ({dest['chat_id']}) failed")
+    return success
+
 # ============ POST BUILDERS ============
 
 def build_release_post(project_name, release, owner, repo):
@@ -681,49 +1469,80 @@ def build_commit_post(project_name, commit, owner, repo):
         f"🔗 <a href='{commit['url']}'>Посмотреть коммит</a>"
     )
 
-def build_repo_post(title, repo_full_name, stars, freshness, description, url):
+def build_commit_range_post(project_name, commit_range, owner, repo):
+    commits = [c for c in commit_range['commits'] if not has_non_latin(c['msg'])]
+    shown = commits[:COMMIT_RANGE_MAX_LINES]
+    hidden = commit_range['total'] - len(shown)
+
+    lines = "\n".join(
+        f"• <a href='{c['url']}'>{c['sha']}</a> {html.escape(c['msg'])}" for c in shown
+    )
+    text = (
+        f"🔄 <b>{html.escape(project_name)}</b>\n\n"
+        f"📦 <code>{owner}/{repo}</code>\n"
+        f"⏰ {get_freshness(commit_range['commits'][0]['date'])} | 📝 {commit_range['total']} коммитов\n\n"
+        f"{lines}\n"
+    )
+    if hidden > 0:
+        text += f"… и ещё {hidden}\n"
+    text += f"\n🔗 <a href='{commit_range['url']}'>Все изменения</a>"
+    return text
+
+def build_repo_post(title, repo_full_name, stars, freshness, description, url, velocity=None):
+    stars_text = f"{stars} (+{int(velocity)}/день)" if velocity and velocity >= 1 else f"{stars}"
     return (
         f"<b>{title}</b>\n\n"
         f"📦 <code>{html.escape(repo_full_name)}</code>\n"
-        f"⭐️ {stars} | ⏰ {freshness}\n"
+        f"⭐️ {stars_text} | ⏰ {freshness}\n"
         f"💡 {html.escape(description)}\n\n"
         f"🔗 <a href='{url}'>Открыть на GitHub</a>"
     )
 
 # ============ DISCOVER CONFIG SOURCES ============
 
+def classify_config_url(url: str):
+    """
+    Тип ссылки на конфиги: raw (файл на GitHub), clash, sub или config;
+    None — если ссылка не подходит или попадает под исключения (iran, SubN.txt).
+    """
+    low = url.lower()
+    hits = {m.group() for m in CONFIG_URL_KEYWORD_RE.finditer(low)}
+
+    if not hits & CONFIG_URL_PROTOCOL_HINTS or not hits & CONFIG_URL_TARGET_HINTS:
+        return None
+    if hits & CONFIG_URL_BAD_HINTS or CONFIG_URL_EXCLUDE_RE.search(url):
+        return None
+
+    if low.startswith("https://raw.githubusercontent.com/") or (
+            low.startswith("https://github.com/") and "/raw" in low):
+        return "raw"
+    if "clash.yml" in hits or "clash.yaml" in hits:
+        return "clash"
+    if "sub" in hits:
+        return "sub"
+    if hits & {"config", "proxy"}:
+        return "config"
+    return None
+
 def extract_config_urls(text: str):
-    urls = set()
+    """Ссылки на конфиги из README за один проход: нормализованные, без дублей"""
     if not text:
         return []
 
-    for pattern in CONFIG_URL_PATTERNS:
-        for m in re.findall(pattern, text):
-            urls.add(m.strip())
-
-    candidates = []
-    for u in urls:
-        low = u.lower()
-        if any(proto in low for proto in ["vless", "vmess", "hysteria", "trojan", "shadow", "sub", "clash"]):
-            candidates.append(u)
-    return candidates
-
-def filter_url_for_russia_and_vless(url: str) -> bool:
-    low = url.lower()
-
-    if not any(p in low for p in ["vless", "reality", "vmess", "xray", "v2ray", "clash", "sub", "subscription"]):
-        return False
-
-    bad_markers = ["iran", "/ir-", "iran-"]
-    if any(b in low for b in bad_markers):
-        return False
-
-    if re.search(r'Sub\d+\.txt$', url):
-        return False
-
-    return True
+    seen = set()
+    urls = []
+    for m in CONFIG_URL_SPAN_RE.finditer(text):
+        # Хвостовая пунктуация markdown: [x](url), url., **url**
+        url = m.group().rstrip(CONFIG_URL_TRAILING)
+        if url in seen:
+            continue
+        seen.add(url)
+        if classify_config_url(url):
+            urls.append(url)
+    return urls
 
 async def discover_config_sources():
+    """Ищет новые источники конфигов; возвращает множество новых URL"""
     logger.info("\n🌐 Discovering new config sources...")
     existing_sources = set(load_config_sources())
     new_sources = set()
@@ -731,7 +1550,7 @@ async def discover_config_sources():
     max_repos = 40
     repos_checked = 0
 
-    for q in CONFIG_SEARCH_QUERIES:
+    for q in shard_slice(CONFIG_SEARCH_QUERIES):
         if repos_checked >= max_repos:
             break
 
@@ -743,154 +1562,408 @@ async def discover_config_sources():
         if not items:
             continue
 
-        for item in items:
-            if repos_checked >= max_repos:
-                break
-
-            full_name = item["full_name"]
-            owner, repo = full_name.split("/")
-            repos_checked += 1
+        items = items[:max_repos - repos_checked]
+        repos_checked += len(items)
+        items = [
+            item for item in items
+            if quick_filter(item.full_name, item.description, item.stars, item.topics)
+        ]
+        await enrich_repos(items)
 
-            if not quick_filter(full_name, item.get("description"), item.get("stargazers_count", 0)):
+        for item in items:
+            if is_likely_fork_spam(item):
                 continue
-
-            text = await fetch_repo_text_async(owner, repo)
+            owner, repo = item.full_name.split("/")
+            text = item.readme
+            if text is None:
+                text = await fetch_repo_text_async(owner, repo)
             if not text:
                 continue
 
-            urls = extract_config_urls(text)
-            for u in urls:
-                if not filter_url_for_russia_and_vless(u):
-                    continue
+            for u in extract_config_urls(text):
                 if u not in existing_sources:
                     logger.info(f"   🆕 Config source: {u}")
                     new_sources.add(u)
 
-    if new_sources:
+    if new_sources and DRY_RUN:
+        logger.info(f"🧪 [dry-run] {len(new_sources)} new config sources not saved")
+    elif new_sources and SHARD:
+        logger.info(f"🧩 {len(new_sources)} new config sources deferred to merge")
+    elif new_sources:
         merged = list(existing_sources | new_sources)
         save_config_sources(merged)
     else:
         logger.info("ℹ️ No new config sources found")
+    return new_sources
 
-# ============ MAIN ============
+# ============ SHARDING ============
+# В режиме --shard i/N каждый воркер берёт свою часть списков, ничего не отправляет,
+# а складывает готовые посты в delta-файл. Команда --merge объединяет delta-файлы,
+# убирает дубли между шардами и только после этого отправляет.
+
+def parse_shard(value):
+    try:
+        index, total = (int(x) for x in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected i/N, got {value!r}")
+    if total < 1 or not 1 <= index <= total:
+        raise argparse.ArgumentTypeError(f"shard index must be in 1..N, got {value!r}")
+    return index, total
+
+def shard_slice(items):
+    """Детерминированная часть списка для текущего шарда (round-robin по порядку)"""
+    if not SHARD:
+        return items
+    index, total = SHARD
+    return items[index - 1::total]
+
+def apply_mark(state, mark):
+    kind, key, value = mark
+    if kind == "posted":
+        state["posted"].add(key)
+    else:
+        state[kind][key] = value
+
+def mark_id(mark):
+    kind, key, value = mark
+    return f"commits:{key}@{value}" if kind == "commits" else f"{kind}:{key}"
 
-async def main():
+OUTBOX_FIELDS = ["stage", "text", "mark", "date", "score", "priority", "search_name"]
+
+async def deliver(state, entry):
+    """
+    Отправка поста во все подходящие каналы с отметкой в состоянии.
+    entry["mark"] — (kind, key, value): ("posted", repo_id, None), ("commits", key, sha)
+    или ("releases", release_key, date). Доставка учитывается по каждому каналу;
+    общая отметка ставится, только когда пост дошёл до всех своих каналов,
+    иначе в следующий запуск он уйдёт лишь в недополучившие.
+    В шарде пост уходит в outbox.
+    """
+    if SHARD:
+        state["outbox"].append({k: entry.get(k) for k in OUTBOX_FIELDS})
+        apply_mark(state, entry["mark"])
+        return True
+
+    mid = mark_id(entry["mark"])
+    targets = [d for d in get_destinations() if destination_accepts(d, entry)]
+    pending = [d for d in targets if mid not in state["delivered"].setdefault(d["name"], set())]
+
+    results = await asyncio.gather(*(send_to_destination(d, entry["text"]) for d in pending))
+    for dest, ok in zip(pending, results):
+        if ok:
+            state["delivered"][dest["name"]].add(mid)
+
+    if targets and all(results):
+        apply_mark(state, entry["mark"])
+    # Публикацией считаем только реальную отправку, а не «уже было везде»
+    return bool(pending) and all(results)
+
+def save_delta(state, path):
+    index, total = SHARD
+    delta = {
+        "shard": [index, total],
+        "created": datetime.now(timezone.utc).isoformat(),
+        "outbox": state["outbox"],
+        "repo_cache": state["repo_cache"],
+        "stars": state["stars"],
+        # Только авторы своего шарда: чужие копии устарели бы к слиянию
+        "owners": {o: state["owners"][o] for o in shard_slice(WATCHED_OWNERS) if o in state["owners"]},
+        "schedule": state["schedule"],
+        "config_sources": sorted(state["config_sources"]),
+    }
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(delta, f, indent=2, ensure_ascii=False)
+        logger.info(f"💾 Delta saved: {path} ({len(state['outbox'])} pending posts)")
+    except Exception as e:
+        logger.error(f"❌ Could not save delta {path}: {e}")
+
+def load_deltas(paths):
+    deltas = []
+    for path in paths:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                deltas.append(json.load(f))
+        except Exception as e:
+            logger.warning(f"⚠️ Could not load delta {path}: {e}")
+    # Порядок не зависит от порядка файлов в командной строке
+    deltas.sort(key=lambda d: tuple(d.get("shard", [0, 0])))
+    return deltas
+
+def merge_outboxes(deltas, state):
+    """
+    Объединение outbox всех шардов: один пост на (kind, key).
+    Для коммитов при конфликте побеждает более свежий, для остальных — первый шард.
+    Уже отмеченное в базовом состоянии отбрасывается.
+    """
+    chosen = {}
+    order = []
+    for delta in deltas:
+        for entry in delta.get("outbox", []):
+            kind, key, value = entry["mark"]
+            ident = (kind, key)
+            if ident not in chosen:
+                chosen[ident] = entry
+                order.append(ident)
+            elif kind == "commits" and (entry.get("date") or "") > (chosen[ident].get("date") or ""):
+                chosen[ident] = entry
+
+    merged = []
+    for ident in order:
+        entry = chosen[ident]
+        kind, key, value = entry["mark"]
+        if kind == "posted" and key in state["posted"]:
+            continue
+        if kind == "commits" and state["commits"].get(key) == value:
+            continue
+        if kind == "releases" and key in state["releases"]:
+            continue
+        merged.append(entry)
+
+    # Общий бюджет делится по скору; sort стабилен, порядок шардов сохраняется
+    merged.sort(key=lambda e: e.get("score", 0.0), reverse=True)
+    return merged
+
+async def merge_and_send(paths):
     logger.info("=" * 60)
-    logger.info("🕵️  SCOUT RADAR v8.3 (optimized)")
+    logger.info(f"🧩 Merging {len(paths)} shard deltas")
     logger.info("=" * 60)
 
     if not validate_env():
         return
 
-    if not check_rate_limit():
-        logger.error("❌ Insufficient API calls. Exiting.")
-        return
+    deltas = load_deltas(paths)
+    state = load_run_state()
 
-    state = load_state()
-    posted = set(state.get("posted", []))
-    commits = state.get("commits", {})
-    releases = state.get("releases", {})
-    repo_cache = state.get("repo_cache", {})
-    count = 0
+    for delta in deltas:
+        for k, v in delta.get("repo_cache", {}).items():
+            state["repo_cache"].setdefault(k, v)
+        merge_star_history(state["stars"], delta.get("stars", {}))
+        merge_schedule(state["schedule"], delta.get("schedule", {}))
+        # Каждый автор есть только в дельте своего шарда — берём её целиком (pending, ETag)
+        state["owners"].update(delta.get("owners", {}))
+        state["config_sources"].update(delta.get("config_sources", []))
 
-    # 1. РЕЛИЗЫ
-    logger.info("\n🚀 Checking releases of tracked projects...")
-    for project in TRACKED_PROJECTS:
-        if count >= MAX_POSTS_PER_RUN:
-            break
+    outbox = merge_outboxes(deltas, state)
+    pending = sum(len(d.get("outbox", [])) for d in deltas)
+    logger.info(f"📬 {len(outbox)} unique posts ({pending - len(outbox)} duplicates/already posted dropped)")
 
+    try:
+        results = await asyncio.gather(*(deliver(state, e) for e in outbox[:MAX_POSTS_PER_RUN]))
+        count = sum(results)
+
+        if DRY_RUN:
+            logger.info("🧪 [dry-run] State not saved")
+        else:
+            save_run_state(state)
+            existing = set(load_config_sources())
+            if state["config_sources"] - existing:
+                save_config_sources(sorted(existing | state["config_sources"]))
+
+        log_request_stats()
+        logger.info(f"🏁 Merge completed! Published: {count} posts")
+    finally:
+        await close_clients()
+
+# ============ STAGES ============
+# Стадии только собирают кандидатов; отправка — в select_and_send
+# по единому бюджету MAX_POSTS_PER_RUN.
+
+def make_candidate(stage, score, mark, date, text=None, item=None, search=None, priority=None):
+    return {
+        "stage": stage, "score": score, "mark": mark, "date": date,
+        "text": text, "item": item, "search": search, "priority": priority,
+        "search_name": search['name'] if search else None,
+        # Поисковые кандидаты проверяются (AI + README) только при отборе
+        "verified": item is None,
+        "trusted": False,
+    }
+
+def candidate_score(stage, date, priority=1.0, trend=0.0):
+    """
+    Ценность кандидата: вес типа × приоритет × свежесть × тренд.
+    Свежесть затухает вдвое за сутки, тренд — trending_scores().
+    """
+    freshness = 0.5 ** (get_age_hours(date) / 24)
+    return STAGE_WEIGHTS[stage] * priority * (0.5 + freshness) * (1 + max(trend, 0) / 5)
+
+def commit_event_dates(head, commit_range, known_sha):
+    """Даты коммитов, появившихся с прошлого опроса (для планировщика)"""
+    if not head or not known_sha or head['sha'] == known_sha:
+        return []
+    if commit_range:
+        return [c['date'] for c in commit_range['commits']]
+    return [head['date']]
+
+def render_commits(project_name, head, commit_range, owner, repo):
+    """Один пост на репо: список коммитов, если их несколько, иначе — голова"""
+    if commit_range and commit_range['total'] > 1:
+        return build_commit_range_post(project_name, commit_range, owner, repo)
+    return build_commit_post(project_name, head, owner, repo)
+
+def project_weight(stage, project):
+    return STAGE_WEIGHTS[stage] * PROJECT_PRIORITY_WEIGHTS.get(project.get('priority'), 0.5)
+
+def log_skipped_polls(skipped, total):
+    if skipped:
+        logger.info(f"   💤 Scheduler skipped {skipped}/{total} dormant repos")
+
+async def collect_releases(state):
+    logger.info("\n🚀 Checking releases of tracked projects...")
+    releases = state["releases"]
+    schedule = state["schedule"]
+    candidates = []
+    projects = shard_slice(TRACKED_PROJECTS)
+    skipped = 0
+    for project in projects:
         owner = project['owner']
         repo = project['repo']
         key = f"{owner}/{repo}"
 
-        fresh_releases = get_recent_releases(owner, repo)
+        if not should_poll(schedule, f"releases:{key}", project_weight("releases", project)):
+            skipped += 1
+            continue
+
+        fresh_releases = get_recent_releases(
+            owner, repo, max_age_hours=poll_max_age_hours(schedule, f"releases:{key}")
+        )
+        # Неудачный запрос — не опрос: иначе репо сочтут «без изменений»
+        if fresh_releases is None:
+            continue
+        record_poll(schedule, f"releases:{key}", [
+            rel['date'] for rel in fresh_releases if f"{key}:{rel['tag']}" not in releases
+        ])
         if not fresh_releases:
             continue
 
         for rel in fresh_releases:
-            if count >= MAX_POSTS_PER_RUN:
-                break
-
             release_key = f"{key}:{rel['tag']}"
             if release_key in releases:
                 continue
 
             logger.info(f"   🆕 Release: {project['name']} {rel['tag']}")
-            success = await send_message_safe(
-                TARGET_CHANNEL_ID,
-                build_release_post(project['name'], rel, owner, repo)
-            )
-
-            if success:
-                releases[release_key] = rel['date']
-                count += 1
-                await asyncio.sleep(MESSAGE_DELAY)
+            priority = PROJECT_PRIORITY_WEIGHTS.get(project.get('priority'), 0.5)
+            if rel['prerelease']:
+                priority *= 0.7
+            candidates.append(make_candidate(
+                "releases", candidate_score("releases", rel['date'], priority),
+                ("releases", release_key, rel['date']), rel['date'],
+                text=build_release_post(project['name'], rel, owner, repo),
+                priority=project.get('priority')
+            ))
+    log_skipped_polls(skipped, len(projects))
+    return candidates
 
-    # 2. КОММИТЫ
+async def collect_commits(state):
     logger.info("\n🔄 Checking commits of tracked projects...")
-    for project in TRACKED_PROJECTS:
-        if count >= MAX_POSTS_PER_RUN:
-            break
-
-        if project.get('priority') == 'low' and count > MAX_POSTS_PER_RUN // 2:
-            continue
-
+    commits = state["commits"]
+    schedule = state["schedule"]
+    candidates = []
+    projects = shard_slice(TRACKED_PROJECTS)
+    skipped = 0
+    for project in projects:
         owner = project['owner']
         repo = project['repo']
         key = f"{owner}/{repo}"
 
-        commit = get_last_commit(owner, repo)
+        if not should_poll(schedule, f"commits:{key}", project_weight("commits", project)):
+            skipped += 1
+            continue
+
+        max_age_hours = poll_max_age_hours(schedule, f"commits:{key}")
+        commit, commit_range = get_new_commits(owner, repo, commits.get(key))
+        if commit is None:
+            continue
+        record_poll(schedule, f"commits:{key}", commit_event_dates(commit, commit_range, commits.get(key)))
         if not commit:
             continue
-        if not is_fresh(commit['date']):
+        if not is_fresh(commit['date'], max_age_hours):
             continue
         if commits.get(key) == commit['sha']:
             continue
 
-        logger.info(f"   🆕 Commit: {project['name']}")
-        success = await send_message_safe(
-            TARGET_CHANNEL_ID,
-            build_commit_post(project['name'], commit, owner, repo)
-        )
-
-        if success:
-            commits[key] = commit['sha']
-            count += 1
-            await asyncio.sleep(MESSAGE_DELAY)
+        logger.info(f"   🆕 Commit: {project['name']}"
+                    + (f" ({commit_range['total']} new)" if commit_range else ""))
+        priority = PROJECT_PRIORITY_WEIGHTS.get(project.get('priority'), 0.5)
+        candidates.append(make_candidate(
+            "commits", candidate_score("commits", commit['date'], priority),
+            ("commits", key, commit['sha']), commit['date'],
+            text=render_commits(project['name'], commit, commit_range, owner, repo),
+            priority=project.get('priority')
+        ))
+    log_skipped_polls(skipped, len(projects))
+    return candidates
 
-    # 3. АГРЕГАТОРЫ КОНФИГОВ
+async def collect_aggregators(state):
     logger.info("\n📡 Checking config aggregators...")
-    for agg in CONFIG_AGGREGATORS:
-        if count >= MAX_POSTS_PER_RUN:
-            break
-
+    commits = state["commits"]
+    schedule = state["schedule"]
+    candidates = []
+    aggregators = shard_slice(CONFIG_AGGREGATORS)
+    skipped = 0
+    for agg in aggregators:
         owner = agg['owner']
         repo = agg['repo']
         key = f"{owner}/{repo}"
 
-        commit = get_last_commit(owner, repo)
-        if not commit or not is_fresh(commit['date']):
+        if not should_poll(schedule, f"commits:{key}", project_weight("aggregators", agg)):
+            skipped += 1
+            continue
+
+        max_age_hours = poll_max_age_hours(schedule, f"commits:{key}")
+        commit, commit_range = get_new_commits(owner, repo, commits.get(key))
+        if commit is None:
+            continue
+        record_poll(schedule, f"commits:{key}", commit_event_dates(commit, commit_range, commits.get(key)))
+        if not commit or not is_fresh(commit['date'], max_age_hours):
             continue
         if commits.get(key) == commit['sha']:
             continue
 
         logger.info(f"   🆕 {agg['name']}")
-        success = await send_message_safe(
-            TARGET_CHANNEL_ID,
-            build_commit_post(agg['name'], commit, owner, repo)
-        )
+        candidates.append(make_candidate(
+            "aggregators", candidate_score("aggregators", commit['date']),
+            ("commits", key, commit['sha']), commit['date'],
+            text=render_commits(agg['name'], commit, commit_range, owner, repo)
+        ))
+    log_skipped_polls(skipped, len(aggregators))
+    return candidates
 
-        if success:
-            commits[key] = commit['sha']
-            count += 1
-            await asyncio.sleep(MESSAGE_DELAY)
+async def collect_owners(state):
+    logger.info("\n👤 Checking new repositories of watched owners...")
+    import aiohttp
+    owners = shard_slice(WATCHED_OWNERS)
+    async with aiohttp.ClientSession(headers=API_HEADERS) as session:
+        results = await asyncio.gather(*(
+            fetch_owner_pending_repos(session, owner, state) for owner in owners
+        ))
+
+    items = [r for repos in results for r in repos]
+    if not items:
+        return []
 
-    # 4. ПОИСК НОВЫХ РЕПОЗИТОРИЕВ
-    logger.info("\n🔍 Searching for new repositories...")
-    for s in FRESH_SEARCHES:
-        if count >= MAX_POSTS_PER_RUN:
-            break
+    record_star_snapshots(state["stars"], items)
+    trends, rates = trending_scores(items, state["stars"])
+    candidates = []
+    for item, trend, rate in zip(items, trends, rates):
+        owner = item.owner
+        logger.info(f"   🆕 New repo from {owner}: {item.full_name}")
+        item.velocity = rate
+        cand = make_candidate(
+            "owners", candidate_score("owners", item.created_ts, 1.0, trend),
+            ("posted", str(item.id), None), item.created_ts,
+            item=item, search={"name": "owners", "title": f"👤 Новое от {owner}"}
+        )
+        cand["trusted"] = True
+        candidates.append(cand)
+    return candidates
 
+async def collect_search(state):
+    logger.info("\n🔍 Searching for new repositories...")
+    posted = state["posted"]
+    # Один репо из нескольких запросов — оставляем вариант с лучшим скором
+    best = {}
+    for s in shard_slice(FRESH_SEARCHES):
         if not check_rate_limit():
             break
 
@@ -899,89 +1972,235 @@ async def main():
         if not items:
             continue
 
-        candidates = []
+        record_star_snapshots(state["stars"], items)
+
+        found = []
         for i in items:
-            repo_id = str(i['id'])
+            repo_id = str(i.id)
 
             if repo_id in posted:
                 continue
-            if not quick_filter(i.get('full_name'), i.get('description'), i.get('stargazers_count', 0)):
+            if not quick_filter(i.full_name, i.description, i.stars, i.topics):
                 continue
             if is_likely_fork_spam(i):
                 continue
 
-            candidates.append(i)
+            found.append(i)
 
-        if not candidates:
+        if not found:
             continue
 
-        # Обрабатываем батчами по 3 репозитория
-        batch_size = 3
-        for batch_start in range(0, len(candidates), batch_size):
-            if count >= MAX_POSTS_PER_RUN:
-                break
+        trends, rates = trending_scores(found, state["stars"])
+        for item, trend, rate in zip(found, trends, rates):
+            item.velocity = rate
+            score = candidate_score("search", item.pushed_ts, s.get('priority', 5) / 10, trend)
+            repo_id = str(item.id)
+            if repo_id not in best or best[repo_id]["score"] < score:
+                best[repo_id] = make_candidate(
+                    "search", score, ("posted", repo_id, None), item.pushed_ts,
+                    item=item, search=s
+                )
+        logger.info(f"   🔍 {len(found)} candidates")
 
-            batch = candidates[batch_start:batch_start + batch_size]
-            decisions = await analyze_relevance(batch)
+    return list(best.values())
 
-            for idx, item in enumerate(batch, 1):
-                if count >= MAX_POSTS_PER_RUN:
-                    break
+async def check_candidate_readme(cand, state):
+    item = cand["item"]
+    owner, repo = item.full_name.split('/')
 
-                if not decisions.get(idx, False):
-                    logger.debug(f"   ⏭ AI filtered: {item['full_name']}")
-                    continue
+    # Проверяем релевантность через README с кэшированием; у доверенных и только
+    # что созданных репо README часто появляется позже — его отсутствие не запоминаем
+    is_relevant = await check_repo_relevance(
+        owner, repo, state["repo_cache"], item.readme, item.topics,
+        cache_missing=not cand["trusted"] and not is_fresh(item.created_ts)
+    )
+    if not is_relevant:
+        logger.info(f"   ⏭ Skipped (irrelevant README): {item.full_name}")
+        return False
+    cand["verified"] = True
+    return True
 
-                owner, repo = item['full_name'].split('/')
-                
-                # Проверяем релевантность через README с кэшированием
-                is_relevant = await check_repo_relevance(owner, repo, repo_cache)
-                if not is_relevant:
-                    logger.info(f"   ⏭ Skipped (irrelevant README): {item['full_name']}")
-                    continue
+async def verify_search_candidates(candidates, state):
+    """
+    GraphQL-обогащение всех сразу, AI-фильтр батчами по 3, затем README.
+    Кандидаты от доверенных авторов AI-фильтр не проходят.
+    Вызывается только для кандидатов, которые ещё проходят в бюджет.
+    """
+    await enrich_repos([c["item"] for c in candidates])
+    candidates = [c for c in candidates if not is_likely_fork_spam(c["item"])]
 
-                final_desc = await generate_desc(item['full_name'], item['description'])
-
-                success = await send_message_safe(
-                    TARGET_CHANNEL_ID,
-                    build_repo_post(
-                        s.get('title', s['name']),
-                        item['full_name'],
-                        item['stargazers_count'],
-                        get_freshness(item['pushed_at']),
-                        final_desc,
-                        item['html_url']
-                    )
-                )
+    accepted = [c for c in candidates if c["trusted"] and await check_candidate_readme(c, state)]
 
-                if success:
-                    posted.add(str(item['id']))
-                    count += 1
-                    logger.info(f"   ✅ {item['full_name']}")
-                    await asyncio.sleep(MESSAGE_DELAY)
+    others = [c for c in candidates if not c["trusted"]]
+    batch_size = 3
+    for batch_start in range(0, len(others), batch_size):
+        batch = others[batch_start:batch_start + batch_size]
+        decisions = await analyze_relevance([c["item"] for c in batch])
 
-            await asyncio.sleep(GROQ_DELAY)
+        for idx, cand in enumerate(batch, 1):
+            if not decisions.get(idx, False):
+                logger.debug(f"   ⏭ AI filtered: {cand['item'].full_name}")
+                continue
+            if await check_candidate_readme(cand, state):
+                accepted.append(cand)
 
-    # 5. ПОИСК ИСТОЧНИКОВ КОНФИГОВ
-    await discover_config_sources()
+        await asyncio.sleep(GROQ_DELAY)
+    return accepted
 
-    # SAVE STATE
-    save_state({
-        "posted": list(posted),
-        "commits": commits,
-        "releases": releases,
-        "repo_cache": repo_cache
-    })
+async def render_search_posts(candidates):
+    """Описания всех принятых репо одним батчем, затем рендер постов"""
+    search = [c for c in candidates if c["item"] is not None]
+    if not search:
+        return
+    descs = await generate_descs([(c["item"].full_name, c["item"].description) for c in search])
+    for cand, desc in zip(search, descs):
+        item = cand["item"]
+        s = cand["search"]
+        cand["text"] = build_repo_post(
+            s.get('title', s['name']),
+            item.full_name,
+            item.stars,
+            get_freshness(item.pushed_ts),
+            desc,
+            item.html_url,
+            item.velocity
+        )
+
+async def select_candidates(candidates, state, budget):
+    """
+    Выбор лучших budget кандидатов через кучу по скору.
+    За раунд снимаем ровно столько, сколько осталось мест; дорогие проверки
+    (LLM, README) идут только для снятых, отсеянные освобождают места
+    для следующего раунда.
+    """
+    # Один репо из поиска и от доверенного автора — оставляем лучший вариант
+    best = {}
+    for c in candidates:
+        mid = mark_id(c["mark"])
+        if mid not in best or best[mid]["score"] < c["score"]:
+            best[mid] = c
+    heap = [(-c["score"], n, c) for n, c in enumerate(best.values())]
+    heapq.heapify(heap)
+    selected = []
+    while heap and len(selected) < budget:
+        top = [heapq.heappop(heap)[2] for _ in range(min(budget - len(selected), len(heap)))]
+        selected.extend(c for c in top if c["verified"])
+        pending = [c for c in top if not c["verified"]]
+        if pending:
+            selected.extend(await verify_search_candidates(pending, state))
+    selected.sort(key=lambda c: c["score"], reverse=True)
+    return selected
+
+async def select_and_send(candidates, state):
+    logger.info(f"\n🎯 Selecting up to {MAX_POSTS_PER_RUN} of {len(candidates)} candidates...")
+    selected = await select_candidates(candidates, state, MAX_POSTS_PER_RUN)
+    await render_search_posts(selected)
+
+    # Все посты стартуют сразу в порядке скора; очередность внутри чата
+    # сохраняет FIFO-блокировка в send_to_destination
+    results = await asyncio.gather(*(deliver(state, cand) for cand in selected))
+    for cand, success in zip(selected, results):
+        if success and cand["item"] is not None:
+            logger.info(f"   ✅ {cand['item'].full_name}")
+    return sum(results)
+
+STAGE_COLLECTORS = {
+    "releases": collect_releases,
+    "commits": collect_commits,
+    "aggregators": collect_aggregators,
+    "owners": collect_owners,
+    "search": collect_search,
+}
+
+# ============ MAIN ============
 
-    logger.info(f"\n{'=' * 60}")
-    logger.info(f"🏁 Completed! Published: {count} posts")
-    logger.info(f"{'=' * 60}")
+async def main(stages=None, delta_path=None):
+    stages = stages or STAGES
+    if SHARD and not delta_path:
+        delta_path = DELTA_FILE_TEMPLATE.format(index=SHARD[0], total=SHARD[1])
 
-    await bot.session.close()
+    logger.info("=" * 60)
+    logger.info("🕵️  SCOUT RADAR v8.3 (optimized)")
+    logger.info("=" * 60)
+    if DRY_RUN:
+        logger.info("🧪 Dry-run: posts are rendered, nothing is sent or saved")
+    logger.info(f"🧩 Stages: {', '.join(stages)}")
+    if SHARD:
+        logger.info(f"🧩 Shard {SHARD[0]}/{SHARD[1]}: posts are deferred to {delta_path}")
+
+    if not validate_env():
+        return
+
+    if not check_rate_limit():
+        logger.error("❌ Insufficient API calls. Exiting.")
+        return
+
+    state = load_run_state()
+
+    try:
+        # Порядок стадий фиксирован, независимо от порядка в аргументах
+        candidates = []
+        for name in STAGES:
+            if name in stages and name in STAGE_COLLECTORS:
+                candidates.extend(await STAGE_COLLECTORS[name](state))
+
+        count = await select_and_send(candidates, state)
+
+        # ПОИСК ИСТОЧНИКОВ КОНФИГОВ
+        if "configs" in stages:
+            state["config_sources"] |= await discover_config_sources()
+
+        # SAVE STATE
+        if SHARD:
+            save_delta(state, delta_path)
+        elif DRY_RUN:
+            logger.info("🧪 [dry-run] State not saved")
+        else:
+            save_run_state(state)
+
+        log_request_stats()
+        logger.info(f"\n{'=' * 60}")
+        logger.info(f"🏁 Completed! Published: {count} posts")
+        logger.info(f"{'=' * 60}")
+    finally:
+        await close_clients()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Scout Radar: GitHub → Telegram")
+    parser.add_argument(
+        "-s", "--stage", dest="stages", action="append", choices=STAGES,
+        help="запустить только указанные стадии (можно несколько раз); по умолчанию все"
+    )
+    parser.add_argument(
+        "--dry-run", action="store_true",
+        help="рендерить посты в лог без отправки и без сохранения состояния"
+    )
+    parser.add_argument(
+        "--shard", type=parse_shard, metavar="i/N",
+        help="обработать только i-ю из N частей списков (i с 1) и записать delta-файл вместо отправки"
+    )
+    parser.add_argument(
+        "--delta-out", metavar="PATH",
+        help=f"путь delta-файла шарда (по умолчанию {DELTA_FILE_TEMPLATE.format(index='i', total='N')})"
+    )
+    parser.add_argument(
+        "--merge", nargs="+", metavar="DELTA",
+        help="объединить delta-файлы шардов, убрать дубли, отправить и сохранить состояние"
+    )
+    args = parser.parse_args(argv)
+    if args.merge and args.shard:
+        parser.error("--merge and --shard are mutually exclusive")
+    return args
 
 if __name__ == "__main__":
+    args = parse_args()
+    DRY_RUN = args.dry_run
+    SHARD = args.shard
     try:
-        asyncio.run(main())
+        if args.merge:
+            asyncio.run(merge_and_send(args.merge))
+        else:
+            asyncio.run(main(args.stages, args.delta_out))
     except KeyboardInterrupt:
         logger.info("\n⏸ Interrupted by user")
     except Exception as e: